@@ -1,8 +1,11 @@
 import re
+import ta_checkpoint as tack
 import ta_classes as ta
+import ta_corners as tac
 import ta_functions as taf
 from pathlib import Path
 import sys
+import time
 
 
 data_path2 = 'data/testcase_10_29/testdata_1'
@@ -11,50 +14,91 @@ case_name = re.search(r'.*/(.+)', data_path2)[1]
 graph2 = ta.NetGraph(data_path=data_path2)
 # graph2.draw()
 
-sequential_paths = []
-comb_paths = []
-for i, start_ff in enumerate(graph2.ff_nodes):
-    for path_nodes in taf.get_paths(graph2.graph, start_ff):
-        # print(path_nodes)
-        # flip flop to flip flop
-        if isinstance(graph2.graph.nodes[path_nodes[-1]]['property'], ta.DFF):
-            path = ta.FFToFFPath(path_nodes, graph2)
-            sequential_paths.append(path)
-        # flip flop to out port
-        elif isinstance(graph2.graph.nodes[path_nodes[-1]]['property'], ta.Port):
-            path = ta.FFToOutPath(path_nodes, graph2)
-            sequential_paths.append(path)
-
-for in_port in graph2.in_ports:
-    for path_nodes in taf.get_paths(graph2.graph, in_port):
+# Walk contracted Cell chains instead of every hop with `--compact`
+analysis_graph = graph2
+if '--compact' in sys.argv:
+    analysis_graph = graph2.compact()
+
+# Only enumerate paths that can violate setup or hold with `--prune`, the
+# violation lists and totals are the same
+get_paths = lambda start: taf.get_paths(analysis_graph.graph, start,
+                                         feedback=True)
+if '--prune' in sys.argv:
+    import ta_search as tas
+    get_paths = tas.ViolationSearch(analysis_graph, keep_comb=True).get_paths
+
+# With `--checkpoint`, progress is saved every CHECKPOINT_SECONDS and a
+# restarted run carries on from the last checkpoint
+CHECKPOINT_SECONDS = 300
+checkpointing = '--checkpoint' in sys.argv
+checkpoint_path = Path(f'rpt/sta_{case_name}.ckpt')
+start_points = graph2.ff_nodes + graph2.in_ports
+out_formats = [out_format for out_format in ('bin', 'jsonl')
+               if f'--{out_format}' in sys.argv]
+fingerprint = tack.run_fingerprint(graph2, data_path2,
+                                   '--compact' in sys.argv, out_formats)
+state = None
+if checkpointing and checkpoint_path.exists():
+    state = tack.AnalysisState.load(checkpoint_path, fingerprint)
+    if state is None:
+        print(f'ignore {checkpoint_path}, the design or options changed')
+    else:
+        print(f'resume from start point {state.next_start}/'
+              f'{len(start_points)}')
+if state is None:
+    state = tack.AnalysisState(fingerprint, top_k=20)
+
+# Structured output next to the text report, e.g. `parse_net.py --bin`,
+# one directory per format
+writers = []
+for out_format in out_formats:
+    import ta_output as tao
+    writers.append(tao.TimingWriter(
+        graph2, f'rpt/sta_{case_name}/{out_format}', fmt=out_format,
+        resume=state.writer_state.get(out_format)))
+
+last_checkpoint = time.time()
+for i in range(state.next_start, len(start_points)):
+    start = start_points[i]
+    for path_nodes in get_paths(start):
         # print(path_nodes)
-        # in port to flip flop
-        if isinstance(graph2.graph.nodes[path_nodes[-1]]['property'], ta.DFF):
-            path = ta.InToFFPath(path_nodes, graph2)
-            sequential_paths.append(path)
-        # in port to out port
-        elif isinstance(graph2.graph.nodes[path_nodes[-1]]['property'], ta.Port):
-            path = ta.InToOutPath(path_nodes, graph2)
-            comb_paths.append(path)
-
-
-setup_violated_paths = [path for path in sequential_paths if path.is_setup_violated]
-hold_violated_paths = [path for path in sequential_paths if path.is_hold_violated]
-# setup_violated_paths = sequential_paths.copy()
-# hold_violated_paths = sequential_paths.copy()
-# Sort
-setup_violated_paths.sort(key=lambda path: path.setup_slack)
-hold_violated_paths.sort(key=lambda path: path.hold_slack)
-# Cal total slack
-total_setup_slack = 0
-total_hold_slack = 0
-total_combinational_delay = 0
-for path in setup_violated_paths:
-    total_setup_slack += path.setup_slack
-for path in hold_violated_paths:
-    total_hold_slack += path.hold_slack
-for path in comb_paths:
-    total_combinational_delay += path.delay
+        end = graph2.graph.nodes[path_nodes[-1]]['property']
+        if i < len(graph2.ff_nodes):
+            # flip flop to flip flop
+            if isinstance(end, ta.DFF):
+                path = ta.FFToFFPath(list(path_nodes), analysis_graph)
+            # flip flop to out port
+            elif isinstance(end, ta.Port):
+                path = ta.FFToOutPath(list(path_nodes), analysis_graph)
+        else:
+            # in port to flip flop
+            if isinstance(end, ta.DFF):
+                path = ta.InToFFPath(list(path_nodes), analysis_graph)
+            # in port to out port
+            elif isinstance(end, ta.Port):
+                path = ta.InToOutPath(list(path_nodes), analysis_graph)
+        state.add_path(path)
+        # Stream the path as soon as it's built
+        for writer in writers:
+            writer.add_path(path)
+    state.next_start = i + 1
+
+    if checkpointing and time.time() - last_checkpoint > CHECKPOINT_SECONDS:
+        state.writer_state = {writer.fmt: writer.state()
+                              for writer in writers}
+        state.save(checkpoint_path)
+        last_checkpoint = time.time()
+
+if writers:
+    import ta_levels as tal
+    endpoint_timing = tal.EndpointTiming(graph2)
+for writer in writers:
+    writer.add_endpoints(endpoint_timing)
+    writer.close()
+
+total_setup_slack = state.total_setup_slack
+total_hold_slack = state.total_hold_slack
+total_combinational_delay = state.total_combinational_delay
 
 sta_rpt = (
     f'Total setup slack {total_setup_slack:.3f} ns\n'
@@ -63,11 +107,14 @@ sta_rpt = (
     '\n\n'
 )
 
-# Get top 20 paths
-if len(setup_violated_paths) > 20:
-    setup_violated_paths = setup_violated_paths[:20]
-if len(hold_violated_paths) > 20:
-    hold_violated_paths = hold_violated_paths[:20]
+# Rebuild the top 20 paths on the full graph for the report, paths found
+# on the compacted graph get their hops back on the way
+def report_path(path_nodes):
+    return tac.make_path(
+        taf.expand_path(analysis_graph.graph, path_nodes), graph2)
+setup_violated_paths = [report_path(nodes) for nodes in state.setup_paths()]
+hold_violated_paths = [report_path(nodes) for nodes in state.hold_paths()]
+comb_paths = [report_path(nodes) for nodes in state.comb_paths]
 
 setup_index = 0
 setup_report = f'Top {len(setup_violated_paths)} setup violated paths:\n'
@@ -100,3 +147,25 @@ Path('./rpt').mkdir(parents=True, exist_ok=True)
 with open(f'rpt/sta_{case_name}.rpt', 'w') as fout:
     fout.write(sta_rpt)
     fout.close()
+# The run is complete, a restart should start over. A checkpoint left by
+# an earlier run is stale too, even without `--checkpoint`
+if checkpoint_path.exists():
+    checkpoint_path.unlink()
+
+# Signoff scenarios, all timed in one pass with `--corners`
+if '--corners' in sys.argv:
+    graph2.set_corners([
+        ta.Corner('typical'),
+        ta.Corner('slow', cable_derate=1.1, tdm_derate=1.1),
+        ta.Corner('fast', cable_derate=0.9, tdm_derate=0.9),
+    ])
+    import ta_levels as tal
+    corner_timing = tal.EndpointTiming(graph2, corners=True)
+    with open(f'rpt/sta_{case_name}_corners.rpt', 'w') as fout:
+        fout.write(tac.corner_report(corner_timing))
+
+# Edges and nodes most violating paths go through, with `--criticality`
+if '--criticality' in sys.argv:
+    import ta_criticality as tacr
+    with open(f'rpt/sta_{case_name}_criticality.rpt', 'w') as fout:
+        fout.write(tacr.Criticality(graph2).report(top=20))
@@ -0,0 +1,107 @@
+import hashlib
+import heapq
+import os
+import pickle
+import ta_classes as ta
+
+
+class AnalysisState:
+    """Everything the path analysis keeps while it walks the start points
+
+    Only the running totals, the top_k worst setup and hold paths and the
+    combinational paths are kept, as node lists, so the state stays small
+    and can be saved at any start point boundary. Paths are ranked by
+    (slack, enumeration order), the same order a stable sort of all the
+    violating paths gives, so a resumed run ends up with exactly the same
+    report as an uninterrupted one.
+    """
+
+    def __init__(self, fingerprint, top_k: int = 20):
+        # Identifies the run a checkpoint belongs to
+        self.fingerprint = fingerprint
+        self.top_k = top_k
+        # Start points [0, next_start) are done
+        self.next_start = 0
+        self.n_paths = 0
+        self.total_setup_slack = 0
+        self.total_hold_slack = 0
+        self.total_combinational_delay = 0
+        # Heaps of (-slack, -order, path nodes), the root is dropped first
+        self.setup_heap = []
+        self.hold_heap = []
+        self.comb_paths = []
+        # TimingWriter.state() of each output format at the time of the
+        # checkpoint
+        self.writer_state = {}
+
+    def add_path(self, path):
+        """Account for a FFToFFPath, InToFFPath, FFToOutPath or InToOutPath"""
+        order = self.n_paths
+        self.n_paths += 1
+        if isinstance(path, ta.InToOutPath):
+            self.total_combinational_delay += path.delay
+            self.comb_paths.append(path.path)
+            return
+        if path.is_setup_violated:
+            self.total_setup_slack += path.setup_slack
+            self._keep(self.setup_heap, path.setup_slack, order, path.path)
+        if path.is_hold_violated:
+            self.total_hold_slack += path.hold_slack
+            self._keep(self.hold_heap, path.hold_slack, order, path.path)
+
+    def setup_paths(self) -> list:
+        """Node lists of the kept setup violated paths, worst first"""
+        return [nodes for _, _, nodes in sorted(self.setup_heap, reverse=True)]
+
+    def hold_paths(self) -> list:
+        """Node lists of the kept hold violated paths, worst first"""
+        return [nodes for _, _, nodes in sorted(self.hold_heap, reverse=True)]
+
+    def save(self, file):
+        """Write the state to file, replacing it only once fully written"""
+        os.makedirs(os.path.dirname(file) or '.', exist_ok=True)
+        tmp = f'{file}.tmp'
+        with open(tmp, 'wb') as fout:
+            pickle.dump(self, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, file)
+
+    @staticmethod
+    def load(file, fingerprint):
+        """Read a state saved by save()
+
+        Returns None if it belongs to another run, i.e. its fingerprint
+        differs because the design files or the options changed.
+        """
+
+        with open(file, 'rb') as f:
+            state = pickle.load(f)
+        if state.fingerprint != fingerprint:
+            return None
+        return state
+
+    def _keep(self, heap: list, slack: float, order: int, nodes: list):
+        item = (-slack, -order, nodes)
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+
+def run_fingerprint(net_graph, data_path, *options) -> tuple:
+    """Identify an analysis run for AnalysisState
+
+    Covers a digest of the design.* files, the setup/hold times, the
+    clocks and the given options (anything changing the results or the
+    output files), so a checkpoint is only resumed by the same run.
+    """
+
+    digest = hashlib.sha256()
+    for file in sorted(os.listdir(data_path)):
+        if file.startswith('design.'):
+            digest.update(file.encode())
+            # Design files can be huge, hash them 1 MB at a time
+            with open(os.path.join(data_path, file), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return (digest.hexdigest(), net_graph.tsu, net_graph.thold,
+            sorted(net_graph.clk.items()), options)
@@ -1,7 +1,7 @@
 from os import name
+import copy
 import re
 import networkx as nx
-import matplotlib.pyplot as plt
 import ta_functions as taf
 
 
@@ -73,6 +73,8 @@ class DFF:
         self.clk = clk
         self.clock_source_latency = 0.0
         self.clock_delay_report = ''
+        # Edges from clock source to this DFF, in reverse order
+        self.clock_path = []
 
     def get_clock_path_delay(self, node):
         """Get the clock source latency from clock source to this node
@@ -98,6 +100,7 @@ class DFF:
     def _add_net_delay(self, node1, node2):
         edge = self.graph.edges[node1, node2]
         delay = edge['delay']
+        self.clock_path.append((node1, node2))
         self.clock_source_latency += delay
         if edge['type'] == 'cable':
             self.clock_delay_report += (
@@ -111,6 +114,38 @@ class DFF:
             )
 
 
+class Corner:
+    """A timing scenario analyzed together with the others
+
+    Cable, tdm and instance (Cell and DFF) delays are scaled by their
+    derate, tsu and thold replace the fixed ones of NetGraph. For example
+    Corner('slow', cable_derate=1.1, tdm_derate=1.2).
+    """
+
+    def __init__(self, name: str, cable_derate: float = 1.,
+                 tdm_derate: float = 1., cell_derate: float = 1.,
+                 tsu: float = 1., thold: float = 1.):
+        self.name = name
+        self.cable_derate = cable_derate
+        self.tdm_derate = tdm_derate
+        self.cell_derate = cell_derate
+        self.tsu = tsu
+        self.thold = thold
+
+    def edge_delay(self, edge: dict) -> float:
+        """Delay of a graph edge in this corner"""
+        if edge['type'] == 'cable':
+            return edge['delay'] * self.cable_derate
+        elif edge['type'] == 'tdm':
+            return edge['delay'] * self.tdm_derate
+        elif edge['type'] == 'chain':
+            # A contracted Cell chain of NetGraph.compact()
+            return (edge['cable_delay'] * self.cable_derate
+                    + edge['tdm_delay'] * self.tdm_derate
+                    + edge['cell_delay'] * self.cell_derate)
+        return edge['delay']
+
+
 class NetGraph:
     def __init__(self, data_path) -> None:
         data_path = data_path
@@ -268,6 +303,15 @@ class NetGraph:
         self.tsu = 1.
         self.thold = 1.
 
+        # Levelized view, reachability index and compacted view, built on
+        # first use
+        self._levels = None
+        self._reachability = None
+        self._compact = None
+
+        # Timing scenarios, see set_corners()
+        self.corners = []
+
     def _add_direction(self, name: str, direction: str):
         """Add direction property"""
         keys = self.graph.nodes[name].keys()
@@ -328,7 +372,62 @@ class NetGraph:
             else:
                 self.graph.add_node(node_name, property=Cell(0.1))
 
+    def levelize(self):
+        """Return the levelized view of the data paths
+
+        It's built once and cached. After changing only delays, call
+        refresh_delays() on the returned object instead of rebuilding it.
+        """
+
+        if self._levels is None:
+            # NumPy is only needed by the array based engines
+            import ta_levels as tal
+            self._levels = tal.LevelizedGraph(self)
+        return self._levels
+
+    def set_corners(self, corners: list):
+        """Set the Corner list analyzed by EndpointTiming(corners=True)
+
+        The graph keeps its nominal delays, every corner delay is derived
+        from them.
+        """
+
+        self.corners = list(corners)
+
+    def compact(self):
+        """Return a NetGraph view whose graph has its Cell chains contracted
+
+        The view shares everything but the graph with this NetGraph, so
+        get_paths(), the Path classes and the timing engines run on it
+        unchanged, only with fewer hops. A path found on the view gets its
+        hops back with taf.expand_path(view.graph, path) before it's built
+        on this NetGraph for a full report.
+        """
+
+        if self._compact is None:
+            view = copy.copy(self)
+            view.graph = taf.compact_chains(self.graph)
+            view._levels = None
+            view._reachability = None
+            view._compact = view
+            self._compact = view
+        return self._compact
+
+    def reachability(self):
+        """Return the cached start point / end point reachability index"""
+        if self._reachability is None:
+            import ta_reach as tar
+            self._reachability = tar.ReachabilityIndex(self)
+        return self._reachability
+
     def draw(self):
+        """Show the whole graph interactively, only for tiny designs
+
+        Use ta_draw.draw_cone() or ta_draw.draw_path() to write a cone or a
+        path of a big design to a file.
+        """
+
+        import matplotlib.pyplot as plt
         nx.draw_kamada_kawai(self.graph, with_labels=True, node_size=1000)
         plt.show()
 
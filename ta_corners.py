@@ -0,0 +1,98 @@
+import ta_classes as ta
+
+
+def corner_path(net_graph, path_nodes: list, corner):
+    """Build the Path object of path_nodes with the delays of corner
+
+    The Path classes read their delays from the graph, so the edges and
+    instances of this path and the clock paths of its DFFs are switched
+    to the corner delays while the Path is built, then put back.
+    """
+
+    graph = net_graph.graph
+    path_nodes = list(path_nodes)
+    dffs = {node: graph.nodes[node]['property']
+            for node in (path_nodes[0], path_nodes[-1])
+            if isinstance(graph.nodes[node]['property'], ta.DFF)}
+    # (graph, edge) pairs, the clock paths live in the graph the DFF walks
+    # which is the full one when path_nodes come from NetGraph.compact()
+    edges = {(graph, edge) for edge in zip(path_nodes, path_nodes[1:])}
+    for ff in dffs.values():
+        edges.update((ff.graph, edge) for edge in ff.clock_path)
+    instances = {id(graph.nodes[node]['property']): graph.nodes[node]['property']
+                 for node in path_nodes
+                 if isinstance(graph.nodes[node]['property'], ta.Cell | ta.DFF)}
+
+    saved_edges = {(id(g), edge): (g, g.edges[edge]['delay'])
+                   for g, edge in edges}
+    saved_instances = {key: instance.delay
+                       for key, instance in instances.items()}
+    saved_clocks = {node: (ff.clock_source_latency, ff.clock_delay_report,
+                           ff.clock_path)
+                    for node, ff in dffs.items()}
+    saved_fixed = (net_graph.tsu, net_graph.thold)
+    try:
+        for g, edge in edges:
+            g.edges[edge]['delay'] = corner.edge_delay(g.edges[edge])
+        for instance in instances.values():
+            instance.delay *= corner.cell_derate
+        for node, ff in dffs.items():
+            ff.clock_source_latency = 0.0
+            ff.clock_delay_report = ''
+            ff.clock_path = []
+            ff.get_clock_path_delay(node)
+        net_graph.tsu = corner.tsu
+        net_graph.thold = corner.thold
+        return make_path(path_nodes, net_graph)
+    finally:
+        for (_, edge), (g, delay) in saved_edges.items():
+            g.edges[edge]['delay'] = delay
+        for key, delay in saved_instances.items():
+            instances[key].delay = delay
+        for node, (latency, report, clock_path) in saved_clocks.items():
+            dffs[node].clock_source_latency = latency
+            dffs[node].clock_delay_report = report
+            dffs[node].clock_path = clock_path
+        net_graph.tsu, net_graph.thold = saved_fixed
+
+
+def make_path(path_nodes: list, net_graph):
+    """Pick the Path class from the start and end point of path_nodes"""
+    graph = net_graph.graph
+    start = graph.nodes[path_nodes[0]]['property']
+    end = graph.nodes[path_nodes[-1]]['property']
+    if isinstance(start, ta.Port):
+        if isinstance(end, ta.DFF):
+            return ta.InToFFPath(path_nodes, net_graph)
+        return ta.InToOutPath(path_nodes, net_graph)
+    if isinstance(end, ta.DFF):
+        return ta.FFToFFPath(path_nodes, net_graph)
+    return ta.FFToOutPath(path_nodes, net_graph)
+
+
+def corner_report(timing) -> str:
+    """Per corner WNS/TNS and worst setup and hold path report
+
+    timing is an EndpointTiming built with corners=True.
+    """
+
+    net_graph = timing.net_graph
+    wns_setup, tns_setup = timing.wns('setup'), timing.tns('setup')
+    wns_hold, tns_hold = timing.wns('hold'), timing.tns('hold')
+    report = ''
+    for k, corner in enumerate(timing.corners):
+        report += (
+            f'Corner {corner.name}:\n'
+            f"{' ':4}setup WNS {wns_setup[k]:.3f} ns TNS {tns_setup[k]:.3f} ns\n"
+            f"{' ':4}hold WNS {wns_hold[k]:.3f} ns TNS {tns_hold[k]:.3f} ns\n"
+        )
+        for kind in ('setup', 'hold'):
+            path_nodes = timing.worst_path(kind, k)
+            if path_nodes is None:
+                continue
+            path = corner_path(net_graph, path_nodes, corner)
+            report += f'Worst {kind} path in corner {corner.name}:\n'
+            report += (path.setup_report if kind == 'setup'
+                       else path.hold_report)
+        report += '\n\n'
+    return report
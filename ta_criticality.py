@@ -0,0 +1,153 @@
+import numpy as np
+import ta_levels as tal
+import ta_search as tas
+
+
+class Criticality:
+    """Worst slack and path count through every data edge and node
+
+    One forward propagation (the arrival times of EndpointTiming) and one
+    backward propagation (the remaining time to the end points, offset by
+    their required times) give the worst setup and hold slack of any path
+    through an edge as arrival at its tail + its delay + remaining time
+    from its head, for every edge at once. The number of paths through an
+    edge is likewise the number of paths into its tail times the number
+    of paths out of its head. Both are linear in the size of the graph,
+    no path is enumerated.
+
+    The exact number of violating paths through an edge isn't known this
+    way, edges and nodes are ranked by their worst slack and then by the
+    number of paths through them. Like EndpointTiming, the feedback path
+    of a DFF back onto itself is counted and timed too.
+    """
+
+    def __init__(self, net_graph, timing: tal.EndpointTiming = None):
+        levels = net_graph.levelize()
+        timing = tal.EndpointTiming(net_graph, levels) if timing is None \
+            else timing
+        self.levels = levels
+        self.net_graph = net_graph
+        tail, head = levels.edge_tail, levels.edge_head
+        is_start = levels.is_start[:, None]
+
+        # Arrival time leaving each node, in the 3 columns of EndpointTiming
+        late_out = np.where(
+            is_start, _fill_nan(timing._launch_late, -np.inf),
+            timing._late + timing.node_delay[:, None])
+        early_out = np.where(
+            is_start, _fill_nan(timing._launch_early, np.inf),
+            timing._early + timing.node_delay[:, None])
+        late = late_out[tail] + levels.edge_delay[:, None]
+        early = early_out[tail] + levels.edge_delay[:, None]
+        remaining_late, remaining_early = tas.remaining_bounds(net_graph)
+        remaining_late = remaining_late[head]
+        remaining_early = remaining_early[head]
+
+        # Forward column 0 (DFF launch) pairs with backward column 0 (DFF
+        # end), forward 1 (in port launch) with backward 2 and forward 2
+        # (DFF launch to out port) with backward 1. Unreached combinations
+        # give +inf.
+        self.edge_setup_slack = np.minimum.reduce([
+            -(late[:, 0] + remaining_late[:, 0]),
+            -(late[:, 1] + remaining_late[:, 2]),
+            -net_graph.tsu - (late[:, 2] + remaining_late[:, 1]),
+        ])
+        self.edge_hold_slack = np.minimum.reduce([
+            early[:, 0] + remaining_early[:, 0],
+            early[:, 1] + remaining_early[:, 2],
+            early[:, 2] + remaining_early[:, 1] - net_graph.thold,
+        ])
+
+        # Path counts grow exponentially with depth, past the float64
+        # range they saturate to inf
+        with np.errstate(over='ignore'):
+            into, out_of = levels.count_paths()
+            self.edge_paths = (
+                np.where(levels.is_start[tail], 1., into[tail])
+                * np.where(levels.is_end[head], 1., out_of[head]))
+            # Paths through a Cell, or starting and ending at a start / end
+            # point
+            self.node_paths = np.where(
+                levels.is_cell, into * out_of,
+                np.where(levels.is_start, out_of, 0.)
+                + np.where(levels.is_end, into, 0.))
+
+        n = len(levels.nodes)
+        self.node_setup_slack = np.full(n, np.inf)
+        self.node_hold_slack = np.full(n, np.inf)
+        for slack, edge_slack in ((self.node_setup_slack,
+                                   self.edge_setup_slack),
+                                  (self.node_hold_slack,
+                                   self.edge_hold_slack)):
+            np.minimum.at(slack, tail, edge_slack)
+            np.minimum.at(slack, head, edge_slack)
+
+    def edges(self, kind: str = 'setup', edge_type: str = None,
+              top: int = None) -> list:
+        """Violating edges, worst slack first, then the most paths first
+
+        edge_type keeps only 'tdm' or 'cable' edges. Returns a list of
+        (tail, head, slack, paths) tuples.
+        """
+
+        levels = self.levels
+        slack = self.edge_setup_slack if kind == 'setup' \
+            else self.edge_hold_slack
+        keep = slack < 0
+        if edge_type is not None:
+            keep &= levels.edge_type == edge_type
+        ids = _rank(np.flatnonzero(keep), slack, self.edge_paths, top)
+        return [(levels.nodes[levels.edge_tail[i]],
+                 levels.nodes[levels.edge_head[i]],
+                 float(slack[i]), float(self.edge_paths[i])) for i in ids]
+
+    def nodes(self, kind: str = 'setup', top: int = None) -> list:
+        """Violating nodes as (node, slack, paths), ranked like edges()"""
+        slack = self.node_setup_slack if kind == 'setup' \
+            else self.node_hold_slack
+        ids = _rank(np.flatnonzero(slack < 0), slack, self.node_paths, top)
+        return [(self.levels.nodes[i], float(slack[i]),
+                 float(self.node_paths[i])) for i in ids]
+
+    def report(self, top: int = 20) -> str:
+        """Top setup and hold critical TDM edges, edges and nodes"""
+        graph = self.net_graph.graph
+        report = ''
+        for kind in ('setup', 'hold'):
+            for title, edge_type in (('TDM edges', 'tdm'), ('edges', None)):
+                edges = self.edges(kind, edge_type, top)
+                report += f'Top {len(edges)} {kind} critical {title}:\n'
+                for k, (u, v, slack, paths) in enumerate(edges, 1):
+                    edge = graph.edges[u, v]
+                    report += (
+                        f"{k:<4}{u + ' -> ' + v:<20}{edge['type']:<7}"
+                        f"{edge['delay']:> 10.3f}  slack {slack:> 10.3f}"
+                        f'  paths {paths:.0f}\n'
+                    )
+                report += '\n\n'
+            nodes = self.nodes(kind, top)
+            report += f'Top {len(nodes)} {kind} critical nodes:\n'
+            for k, (node, slack, paths) in enumerate(nodes, 1):
+                group = graph.nodes[node].get('group', '')
+                report += (f'{k:<4}{node:<10}{group:<8}'
+                           f'slack {slack:> 10.3f}  paths {paths:.0f}\n')
+            report += '\n\n'
+        return report
+
+
+def _rank(ids: np.ndarray, slack: np.ndarray, paths: np.ndarray,
+          top: int = None) -> np.ndarray:
+    """ids sorted by slack, ties by most paths, cut to the top ones"""
+    # Slacks summed in a different order differ in the last bits, rank
+    # them as ties
+    key = np.round(slack[ids], 9)
+    if top is not None and len(ids) > top:
+        # Only the top ones need sorting, keep every slack tie at the cut
+        keep = key <= np.partition(key, top - 1)[top - 1]
+        ids, key = ids[keep], key[keep]
+    ids = ids[np.lexsort((-paths[ids], key))]
+    return ids[:top]
+
+
+def _fill_nan(values: np.ndarray, fill: float) -> np.ndarray:
+    return np.where(np.isnan(values), fill, values)
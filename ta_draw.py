@@ -0,0 +1,232 @@
+import ta_classes as ta
+
+
+def cone(net_graph, nodes, fanin: bool = True, fanout: bool = True,
+         depth: int = None) -> set:
+    """Nodes of the data path fanin and/or fanout cone of nodes
+
+    The cone stops at start and end points (DFF and ports) like a timing
+    path does, and after depth edges if depth is given. Clock network
+    nodes are left out.
+    """
+
+    fanin_nodes, fanout_nodes = _cone_sides(net_graph, nodes, fanin, fanout,
+                                            depth)
+    return set(nodes) | fanin_nodes | fanout_nodes
+
+
+def draw_cone(net_graph, nodes, file, fanin: bool = True,
+              fanout: bool = True, depth: int = None,
+              group_fpga: bool = False, max_nodes: int = 2000):
+    """Draw the fanin/fanout cone of nodes to an SVG or PNG file
+
+    nodes are in the middle column, their fanin cone to the left and
+    their fanout cone to the right.
+    """
+
+    if not nodes:
+        raise Exception('nothing to draw, no node given')
+    fanin_nodes, fanout_nodes = _cone_sides(net_graph, nodes, fanin, fanout,
+                                            depth)
+    size = len(set(nodes) | fanin_nodes | fanout_nodes)
+    if size > max_nodes:
+        raise Exception(f'cone of {size} nodes is over max_nodes '
+                        f'{max_nodes}, limit it with depth')
+    edges = _cone_edges(net_graph, nodes, fanin_nodes, fanout_nodes)
+    column = _cone_columns(net_graph, nodes, fanin_nodes, fanout_nodes,
+                           edges)
+    _render(net_graph, column, edges, file, highlight=set(nodes),
+            group_fpga=group_fpga)
+
+
+def draw_path(net_graph, path_nodes: list, file, group_fpga: bool = True):
+    """Draw a timing path to an SVG or PNG file, with its edge delays"""
+    if not path_nodes:
+        raise Exception('nothing to draw, no node given')
+    edges = list(zip(path_nodes, path_nodes[1:]))
+    # One column per hop, a DFF feedback path keeps its DFF at the start
+    column = {}
+    for k, node in enumerate(path_nodes):
+        column.setdefault(node, k)
+    _render(net_graph, column, edges, file, highlight=set(path_nodes),
+            group_fpga=group_fpga, path_edges=edges)
+
+
+def _cone_sides(net_graph, nodes, fanin: bool, fanout: bool,
+                depth: int = None):
+    """Fanin cone and fanout cone of nodes, without nodes themselves"""
+    graph = net_graph.graph
+    levels = net_graph.levelize()
+    index = levels.index
+
+    def is_data(node):
+        i = index[node]
+        return levels.is_start[i] or levels.is_end[i] or levels.is_cell[i]
+
+    def walk(neighbors, stop):
+        seen = set(nodes)
+        frontier = list(nodes)
+        current = 0
+        while frontier and (depth is None or current < depth):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in neighbors(node):
+                    if neighbor in seen or not is_data(neighbor):
+                        continue
+                    seen.add(neighbor)
+                    if not stop[index[neighbor]]:
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+            current += 1
+        return seen - set(nodes)
+
+    fanin_nodes = walk(graph.predecessors, levels.is_start) if fanin \
+        else set()
+    fanout_nodes = walk(graph.successors, levels.is_end) if fanout \
+        else set()
+    return fanin_nodes, fanout_nodes
+
+
+def _cone_columns(net_graph, nodes, fanin_nodes: set, fanout_nodes: set,
+                  edges: list) -> dict:
+    """Column of every cone node, so that the drawn edges point right
+
+    nodes are in column 0. Fanout nodes are placed in topological order,
+    one column right of their rightmost placed driver, fanin nodes in
+    reverse topological order, one column left of their leftmost placed
+    load. Only a loop back into nodes (a DFF feedback path) still has an
+    edge pointing left. A node in both cones is drawn in the fanout one.
+    """
+
+    levels = net_graph.levelize()
+    index = levels.index
+
+    def order(node):
+        # Cells by level, the start or end points of the cone after them
+        i = index[node]
+        return not levels.is_cell[i], int(levels.level[i]), node
+
+    def reverse_order(node):
+        i = index[node]
+        return bool(levels.is_cell[i]), int(levels.level[i]), node
+
+    drivers, loads = {}, {}
+    for u, v in edges:
+        drivers.setdefault(v, []).append(u)
+        loads.setdefault(u, []).append(v)
+    column = {node: 0 for node in nodes}
+    for node in sorted(fanout_nodes, key=order):
+        column[node] = max((column[u] for u in drivers.get(node, ())
+                            if u in column), default=0) + 1
+    for node in sorted(fanin_nodes - fanout_nodes, key=reverse_order,
+                       reverse=True):
+        column[node] = min((column[v] for v in loads.get(node, ())
+                            if v in column), default=0) - 1
+    return column
+
+
+def _cone_edges(net_graph, nodes, fanin_nodes: set,
+                fanout_nodes: set) -> list:
+    """Edges of the cone paths
+
+    An edge leaving a fanout end point or entering a fanin start point
+    isn't on any path through nodes and isn't drawn.
+    """
+
+    graph = net_graph.graph
+    is_cell = net_graph.levelize().is_cell
+    index = net_graph.levelize().index
+    seeds = set(nodes)
+    fanout_tails = seeds | {u for u in fanout_nodes if is_cell[index[u]]}
+    fanin_heads = seeds | {v for v in fanin_nodes if is_cell[index[v]]}
+    edges = []
+    for u in seeds | fanin_nodes | fanout_nodes:
+        for v in graph.successors(u):
+            if ((u in fanout_tails and (v in fanout_nodes or v in seeds))
+                    or (v in fanin_heads and (u in fanin_nodes or u in seeds))):
+                edges.append((u, v))
+    return edges
+
+
+def _layered_layout(net_graph, column: dict, group_fpga: bool) -> dict:
+    """Position of every node: x from its column, y by order within it
+
+    Empty columns are compressed away. Linear in the number of nodes, up
+    to the sort within each column.
+    """
+
+    graph = net_graph.graph
+    by_column = {}
+    for node, x in column.items():
+        by_column.setdefault(x, []).append(node)
+    x_of = {x: k for k, x in enumerate(sorted(by_column))}
+    position = {}
+    for x, column_nodes in by_column.items():
+        if group_fpga:
+            column_nodes.sort(key=lambda node: (
+                graph.nodes[node].get('group', ''), node))
+        else:
+            column_nodes.sort()
+        for y, node in enumerate(column_nodes):
+            position[node] = (x_of[x], -y)
+    return position
+
+
+def _render(net_graph, column: dict, edges: list, file, highlight: set = (),
+            group_fpga: bool = False, path_edges: list = ()):
+    # Plotting is only imported here, without pyplot and its GUI backends
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    graph = net_graph.graph
+    members = set(column)
+    position = _layered_layout(net_graph, column, group_fpga)
+    width = max(x for x, _ in position.values()) + 1
+    height = max(-y for _, y in position.values()) + 1
+    fig = Figure(figsize=(min(4 + 1.5 * width, 200),
+                          min(2 + 0.4 * height, 200)))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_axis_off()
+
+    path_edges = set(path_edges)
+    segments, colors = [], []
+    for u, v in edges:
+        segments.append((position[u], position[v]))
+        colors.append('tab:red' if (u, v) in path_edges else 'lightgray')
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=0.8,
+                                     zorder=1))
+    for u, v in path_edges:
+        (x1, y1), (x2, y2) = position[u], position[v]
+        edge = graph.edges[u, v]
+        if edge['type'] != 'none':
+            ax.annotate(f"{edge['delay']:.3f} {edge['type']}",
+                        ((x1 + x2) / 2, (y1 + y2) / 2), fontsize=6,
+                        ha='center', va='bottom', color='tab:red')
+
+    groups = sorted({graph.nodes[node].get('group', '') for node in members})
+    palette = [f'C{k % 10}' for k in range(len(groups))]
+    color_of = dict(zip(groups, palette)) if group_fpga else {}
+    for group in groups if group_fpga else ['']:
+        group_nodes = [node for node in members if not group_fpga
+                       or graph.nodes[node].get('group', '') == group]
+        ax.scatter([position[node][0] for node in group_nodes],
+                   [position[node][1] for node in group_nodes],
+                   s=[60 if node in highlight else 25 for node in group_nodes],
+                   marker='o', color=color_of.get(group, 'tab:blue'),
+                   edgecolors=['black' if node in highlight else 'none'
+                               for node in group_nodes],
+                   label=group or None, zorder=2)
+    for node in members:
+        kind = graph.nodes[node].get('property')
+        label = node
+        if isinstance(kind, ta.DFF):
+            label += ' (ff)'
+        ax.annotate(label, position[node], fontsize=6,
+                    xytext=(0, 5), textcoords='offset points', ha='center')
+    if group_fpga:
+        ax.legend(loc='upper left', bbox_to_anchor=(1, 1), fontsize=6)
+    ax.autoscale()
+    ax.margins(0.05)
+    fig.savefig(file, bbox_inches='tight')
@@ -3,7 +3,7 @@ import networkx as nx
 import ta_classes as ta
 
 
-def get_paths(G: nx.DiGraph, start) -> list:
+def get_paths(G: nx.DiGraph, start, keep=None, feedback: bool = False) -> list:
     def get_paths_recursive(G: nx.DiGraph, parent, path_nodes: list) -> list:
         """A generator returns paths
         
@@ -11,9 +11,14 @@ def get_paths(G: nx.DiGraph, start) -> list:
         from this start node. It firstly selects a child of start, if this child
         is DFF or Port, it returns. Else, make this child as start and 
         recursively search all children of this child.
+        If keep is given, a child is only visited when keep(child) is true.
+        With feedback, a path from a DFF back to that same DFF is returned
+        too, as the timing engines (EndpointTiming, ...) time it.
         """
         for child in G[parent]:
-            if child not in path_nodes:
+            if keep is not None and not keep(child):
+                continue
+            if child not in path_nodes or (loop_back and child == start):
                 path_nodes.append(child)
                 if isinstance(G.nodes[child]['property'], ta.DFF | ta.Port):
                     yield path_nodes
@@ -22,6 +27,7 @@ def get_paths(G: nx.DiGraph, start) -> list:
                         yield child_path
                 path_nodes.pop(-1)
 
+    loop_back = feedback and isinstance(G.nodes[start]['property'], ta.DFF)
     for path_nodes in get_paths_recursive(G, start, [start]):
         yield path_nodes
 
@@ -49,3 +55,67 @@ def lowest_common_ancestor_of_nodes(G: nx.DiGraph, nodes: Iterable[str]):
     LCA = [node for node in common_ancestors_of_nodes
            if G.out_degree[node] == 0]
     return LCA
+
+
+def compact_chains(G: nx.DiGraph) -> nx.DiGraph:
+    """Contract chains of single fanin / single fanout Cells
+
+    Returns a new graph without those Cells. Each chain u -> c1 -> ... ->
+    cn -> v becomes one super-edge u -> v of type 'chain' whose delay is
+    the sum of the edge and cell delays along it and whose 'hops' are
+    [c1, ..., cn]. That delay is also split into 'cable_delay',
+    'tdm_delay' and 'cell_delay' so corners can derate each part. Other
+    nodes and edges are copied as they are. A chain
+    is kept as it is if it would turn into a second edge between the same
+    two nodes.
+    """
+
+    def is_link(node):
+        return (isinstance(G.nodes[node].get('property'), ta.Cell)
+                and G.in_degree(node) == 1 and G.out_degree(node) == 1)
+
+    R = nx.DiGraph()
+    R.add_nodes_from((node, data) for node, data in G.nodes(data=True)
+                     if not is_link(node))
+
+    # Walk every edge leaving a kept node down to the next kept node
+    edges = []
+    for u in R:
+        for v, data in G[u].items():
+            hops = []
+            parts = {'cable': 0., 'tdm': 0., 'cell': 0., 'none': 0.}
+            parts[data['type']] += data['delay']
+            while is_link(v):
+                hops.append(v)
+                w = next(iter(G[v]))
+                parts['cell'] += G.nodes[v]['property'].delay
+                parts[G.edges[v, w]['type']] += G.edges[v, w]['delay']
+                v = w
+            edges.append((u, v, hops, parts, data))
+
+    count = {}
+    for u, v, _, _, _ in edges:
+        count[u, v] = count.get((u, v), 0) + 1
+    for u, v, hops, parts, data in edges:
+        if not hops:
+            R.add_edge(u, v, **data)
+        elif count[u, v] == 1:
+            R.add_edge(u, v, delay=sum(parts.values()), type='chain',
+                       hops=hops, cable_delay=parts['cable'],
+                       tdm_delay=parts['tdm'], cell_delay=parts['cell'])
+        else:
+            # Keep the chain as it is
+            nodes = [u] + hops + [v]
+            for a, b in zip(nodes, nodes[1:]):
+                R.add_node(b, **G.nodes[b])
+                R.add_edge(a, b, **G.edges[a, b])
+    return R
+
+
+def expand_path(G: nx.DiGraph, path: list) -> list:
+    """Put the hops of the 'chain' edges of G back into path"""
+    nodes = [path[0]]
+    for u, v in zip(path, path[1:]):
+        nodes.extend(G.edges[u, v].get('hops', ()))
+        nodes.append(v)
+    return nodes
@@ -0,0 +1,493 @@
+import numpy as np
+import ta_classes as ta
+
+
+class LevelizedGraph:
+    """Array based, levelized view of the data paths of a NetGraph
+
+    Start points (DFF and in port) are put on level 0 and every
+    combinational Cell is put on 1 + the deepest level of its fanin, so all
+    the fanin of a node on level L is final once levels 0..L-1 have been
+    propagated. Edges are stored as flat tail/head/delay arrays sorted by
+    the level of their tail, which lets one level be propagated with a
+    single NumPy scatter-reduction.
+
+    The topology is built once and cached by NetGraph.levelize(). Delays
+    live in separate arrays, so a run that only changes delays just calls
+    refresh_delays() (or passes its own delay arrays to propagate()).
+    """
+
+    def __init__(self, net_graph):
+        self.net_graph = net_graph
+        graph = net_graph.graph
+        self.nodes = list(graph.nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+
+        # Classify nodes once, the propagation itself never looks at the
+        # node properties again
+        kind = np.fromiter((_node_kind(p) for _, p in
+                            graph.nodes(data='property')), np.int8, n)
+        self.is_dff = kind == _DFF
+        self.is_in_port = kind == _IN_PORT
+        self.is_port = self.is_in_port | (kind == _OUT_PORT)
+        self.is_cell = kind == _CELL
+        self.is_start = self.is_dff | self.is_in_port
+        self.is_end = self.is_dff | self.is_port
+
+        # Data edges leave a start point or a Cell and enter an end point
+        # or a Cell, the same edges get_paths() walks. Clock network
+        # edges are left out.
+        edges = list(graph.edges)
+        tail = np.fromiter((self.index[u] for u, _ in edges), np.int64,
+                           len(edges))
+        head = np.fromiter((self.index[v] for _, v in edges), np.int64,
+                           len(edges))
+        is_data = ((self.is_start[tail] | self.is_cell[tail])
+                   & (self.is_end[head] | self.is_cell[head]))
+        self._edge_ids = np.flatnonzero(is_data)
+        tail = tail[is_data]
+        head = head[is_data]
+
+        self.level = self._levelize(n, tail, head)
+        self.n_levels = int(self.level.max(initial=-1)) + 1
+
+        # Sort edges by the level of their tail and cells by their level
+        order = np.argsort(self.level[tail], kind='stable')
+        self._edge_ids = self._edge_ids[order]
+        self.edge_tail = tail[order]
+        self.edge_head = head[order]
+        self.level_edges = np.searchsorted(
+            self.level[self.edge_tail], np.arange(self.n_levels + 1))
+        cells = np.flatnonzero(self.is_cell & (self.level >= 0))
+        self.level_cell_nodes = cells[np.argsort(self.level[cells],
+                                                 kind='stable')]
+        self.level_cells = np.searchsorted(
+            self.level[self.level_cell_nodes], np.arange(self.n_levels + 1))
+
+        self._edge_type = None
+        self.refresh_delays()
+
+    def _levelize(self, n: int, tail: np.ndarray, head: np.ndarray):
+        """Return the level of each node, -1 for nodes off the data paths
+
+        Kahn's algorithm run one whole frontier at a time. Only Cells wait
+        for their fanin, start and end points never propagate through.
+        """
+
+        level = np.full(n, -1, dtype=np.int64)
+        into_cell = self.is_cell[head]
+        pending = np.bincount(head[into_cell], minlength=n)
+
+        # CSR of the edges leaving each node
+        order = np.argsort(tail, kind='stable')
+        csr_head = head[order]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tail, minlength=n), out=offsets[1:])
+
+        # Cells without any data fanin (e.g. only fed by a removed Power
+        # node) can't be reached, but still get a level to keep the arrays
+        # dense.
+        frontier = np.flatnonzero(self.is_start
+                                  | (self.is_cell & (pending == 0)))
+        current = 0
+        while frontier.size:
+            level[frontier] = current
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            total = counts.sum()
+            if total == 0:
+                break
+            edges = (np.repeat(starts - np.cumsum(counts) + counts, counts)
+                     + np.arange(total))
+            heads = csr_head[edges]
+            heads = heads[self.is_cell[heads]]
+            np.subtract.at(pending, heads, 1)
+            frontier = np.unique(heads[pending[heads] == 0])
+            current += 1
+
+        unleveled = self.is_cell & (level < 0) & (pending > 0)
+        if unleveled.any():
+            loop = [self.nodes[i] for i in np.flatnonzero(unleveled)[:10]]
+            raise Exception(f'combinational loop through cells {loop}')
+        return level
+
+    def refresh_delays(self):
+        """Re-read Cell.delay, DFF.delay and the edge delays from the graph"""
+        graph = self.net_graph.graph
+        self.node_delay = np.fromiter(
+            (p.delay if isinstance(p, ta.Cell | ta.DFF) else 0.0
+             for _, p in graph.nodes(data='property')),
+            np.float64, len(self.nodes))
+        edge_delay = np.fromiter(
+            (delay for _, _, delay in graph.edges(data='delay', default=0.0)),
+            np.float64)
+        self.edge_delay = edge_delay[self._edge_ids]
+
+    @property
+    def edge_type(self) -> np.ndarray:
+        """'cable', 'tdm' or 'none' for every data edge, read on first use"""
+        if self._edge_type is None:
+            edge_type = np.array(
+                [t for _, _, t in self.net_graph.graph.edges(data='type')])
+            self._edge_type = edge_type[self._edge_ids]
+        return self._edge_type
+
+    def corner_delays(self, corners: list):
+        """Node and edge delay arrays with one column per Corner"""
+        is_cable = (self.edge_type == 'cable')[:, None]
+        is_tdm = (self.edge_type == 'tdm')[:, None]
+        cable = np.array([corner.cable_derate for corner in corners])
+        tdm = np.array([corner.tdm_derate for corner in corners])
+        cell = np.array([corner.cell_derate for corner in corners])
+        derate = np.where(is_cable, cable, np.where(is_tdm, tdm, 1.))
+        edge_delay = self.edge_delay[:, None] * derate
+        chains = np.flatnonzero(self.edge_type == 'chain')
+        if chains.size:
+            # Super-edges of NetGraph.compact() derate each part of their
+            # delay on its own
+            graph = self.net_graph.graph
+            ids = self._edge_ids[chains]
+            parts = np.column_stack([
+                np.fromiter((d for _, _, d in graph.edges(
+                    data=f'{part}_delay', default=0.)), np.float64)[ids]
+                for part in ('cable', 'tdm', 'cell')])
+            edge_delay[chains] = parts @ np.stack([cable, tdm, cell])
+        return self.node_delay[:, None] * cell, edge_delay
+
+    def propagate(self, sources, late_values, early_values=None,
+                  node_delay=None, edge_delay=None):
+        """Propagate max (late) and min (early) arrival times level by level
+
+        Parameters
+        ----------
+        sources : indexes of the start points that launch data
+
+        late_values, early_values : arrival time leaving each source, with
+            shape (len(sources),) or (len(sources), k) to propagate k
+            independent columns at once. NaN means the source doesn't
+            launch in that column. early_values defaults to late_values.
+
+        node_delay, edge_delay : optional delay arrays overriding the
+            cached ones, either 1-D or with a trailing column axis.
+
+        Returns
+        -------
+        late, early : arrival times at the input of every node, shaped
+            (n,) or (n, k). Unreached nodes hold -inf / inf.
+        """
+
+        if early_values is None:
+            early_values = late_values
+        late_values = np.asarray(late_values, dtype=np.float64)
+        early_values = np.asarray(early_values, dtype=np.float64)
+        node_delay = self.node_delay if node_delay is None else node_delay
+        edge_delay = self.edge_delay if edge_delay is None else edge_delay
+        shape = (len(self.nodes),) + late_values.shape[1:]
+        node_delay = _broadcast_columns(node_delay, len(shape))
+        edge_delay = _broadcast_columns(edge_delay, len(shape))
+
+        late_in = np.full(shape, -np.inf)
+        early_in = np.full(shape, np.inf)
+        late_out = np.full(shape, -np.inf)
+        early_out = np.full(shape, np.inf)
+        late_out[sources] = np.where(np.isnan(late_values), -np.inf,
+                                     late_values)
+        early_out[sources] = np.where(np.isnan(early_values), np.inf,
+                                      early_values)
+
+        for current in range(self.n_levels):
+            # Cells on this level have got all their fanin, add cell delay
+            cells = self.level_cell_nodes[
+                self.level_cells[current]:self.level_cells[current + 1]]
+            if cells.size:
+                late_out[cells] = late_in[cells] + node_delay[cells]
+                early_out[cells] = early_in[cells] + node_delay[cells]
+            # Then push them over the edges leaving this level
+            edges = slice(self.level_edges[current],
+                          self.level_edges[current + 1])
+            tails = self.edge_tail[edges]
+            heads = self.edge_head[edges]
+            if tails.size:
+                delay = edge_delay[edges]
+                np.maximum.at(late_in, heads, late_out[tails] + delay)
+                np.minimum.at(early_in, heads, early_out[tails] + delay)
+        return late_in, early_in
+
+    def propagate_backward(self, sinks, late_values, early_values=None,
+                           node_delay=None, edge_delay=None):
+        """Propagate max (late) and min (early) remaining times backwards
+
+        The mirror image of propagate(): the sinks are end points holding
+        a value at their input, and each node gets the max and min over
+        its fanout end points of (delay from its input to that end point
+        + the end point value). A path arriving at node n at time t thus
+        reaches its end points no later than t + late[n] and no earlier
+        than t + early[n]. Parameters are the same as for propagate().
+        """
+
+        if early_values is None:
+            early_values = late_values
+        late_values = np.asarray(late_values, dtype=np.float64)
+        early_values = np.asarray(early_values, dtype=np.float64)
+        node_delay = self.node_delay if node_delay is None else node_delay
+        edge_delay = self.edge_delay if edge_delay is None else edge_delay
+        shape = (len(self.nodes),) + late_values.shape[1:]
+        node_delay = _broadcast_columns(node_delay, len(shape))
+        edge_delay = _broadcast_columns(edge_delay, len(shape))
+
+        late_in = np.full(shape, -np.inf)
+        early_in = np.full(shape, np.inf)
+        late_out = np.full(shape, -np.inf)
+        early_out = np.full(shape, np.inf)
+        late_in[sinks] = np.where(np.isnan(late_values), -np.inf,
+                                  late_values)
+        early_in[sinks] = np.where(np.isnan(early_values), np.inf,
+                                   early_values)
+
+        for current in reversed(range(self.n_levels)):
+            # Edges leaving this level only enter deeper, final cells or
+            # end points
+            edges = slice(self.level_edges[current],
+                          self.level_edges[current + 1])
+            tails = self.edge_tail[edges]
+            heads = self.edge_head[edges]
+            if tails.size:
+                delay = edge_delay[edges]
+                np.maximum.at(late_out, tails, late_in[heads] + delay)
+                np.minimum.at(early_out, tails, early_in[heads] + delay)
+            cells = self.level_cell_nodes[
+                self.level_cells[current]:self.level_cells[current + 1]]
+            if cells.size:
+                late_in[cells] = late_out[cells] + node_delay[cells]
+                early_in[cells] = early_out[cells] + node_delay[cells]
+        return late_in, early_in
+
+    def count_paths(self):
+        """Number of data paths into and out of every node
+
+        Returns
+        -------
+        into : number of paths from any start point to the input of each
+            node, i.e. the paths ending at an end point
+        out_of : number of paths from the output of each node to any end
+            point, i.e. the paths starting at a start point
+
+        For a Cell, into * out_of is the number of paths through it. The
+        counts are float64, exact up to 2**53 paths.
+        """
+
+        n = len(self.nodes)
+        into = np.zeros(n)
+        leaving = np.where(self.is_start, 1., 0.)
+        for current in range(self.n_levels):
+            cells = self.level_cell_nodes[
+                self.level_cells[current]:self.level_cells[current + 1]]
+            leaving[cells] = into[cells]
+            edges = slice(self.level_edges[current],
+                          self.level_edges[current + 1])
+            np.add.at(into, self.edge_head[edges],
+                      leaving[self.edge_tail[edges]])
+
+        out_of = np.zeros(n)
+        entering = np.where(self.is_end, 1., 0.)
+        for current in reversed(range(self.n_levels)):
+            edges = slice(self.level_edges[current],
+                          self.level_edges[current + 1])
+            np.add.at(out_of, self.edge_tail[edges],
+                      entering[self.edge_head[edges]])
+            cells = self.level_cell_nodes[
+                self.level_cells[current]:self.level_cells[current + 1]]
+            entering[cells] = out_of[cells]
+        return into, out_of
+
+
+class EndpointTiming:
+    """Worst setup and hold slack of every end point
+
+    Follows the same conventions as the Path classes: an in port launches
+    with the clock latency and delay of the catch DFF, and a DFF to out
+    port path is checked against the clock of its launch DFF. The feedback
+    path of a DFF back onto itself is timed too, like get_paths() does
+    with feedback=True.
+
+    With corners, every corner in net_graph.corners is timed in the same
+    pass and every result array gets a trailing corner axis.
+    """
+
+    def __init__(self, net_graph, levels: LevelizedGraph = None,
+                 corners: bool = False):
+        levels = net_graph.levelize() if levels is None else levels
+        self.levels = levels
+        self.net_graph = net_graph
+        self.corners = net_graph.corners if corners else []
+        graph = net_graph.graph
+
+        ffs = np.flatnonzero(levels.is_dff)
+        ins = np.flatnonzero(levels.is_in_port)
+        dffs = [graph.nodes[levels.nodes[i]]['property'] for i in ffs]
+        period = np.array([net_graph.clk[ff.clk] for ff in dffs])
+        if self.corners:
+            node_delay, edge_delay = levels.corner_delays(self.corners)
+            latency = np.array([
+                [sum(corner.edge_delay(graph.edges[edge])
+                     for edge in ff.clock_path) for corner in self.corners]
+                for ff in dffs]).reshape(len(ffs), len(self.corners))
+            period = period[:, None]
+            tsu = np.array([corner.tsu for corner in self.corners])
+            thold = np.array([corner.thold for corner in self.corners])
+        else:
+            node_delay, edge_delay = levels.node_delay, levels.edge_delay
+            latency = np.array([ff.clock_source_latency for ff in dffs])
+            tsu = net_graph.tsu
+            thold = net_graph.thold
+        delay = node_delay[ffs]
+        self.node_delay = node_delay
+
+        # Column 0: DFF launch, absolute arrival time
+        # Column 1: in port launch, arrival relative to the virtual DFF
+        # Column 2: DFF launch, relative to its own clock (DFF to out port)
+        sources = np.concatenate([ffs, ins])
+        nan_ff = np.full(latency.shape, np.nan)
+        nan_in = np.full((len(ins),) + latency.shape[1:], np.nan)
+        late_values = np.stack([
+            np.concatenate([latency + delay, nan_in]),
+            np.concatenate([nan_ff, np.zeros(nan_in.shape)]),
+            np.concatenate([delay - period, nan_in]),
+        ], axis=-1)
+        early_values = late_values.copy()
+        early_values[:len(ffs), ..., 2] = delay
+        late, early = levels.propagate(sources, late_values, early_values,
+                                       node_delay, edge_delay)
+        # Kept to trace worst paths back
+        self._late, self._early = late, early
+        self._launch_late = np.full(late.shape, np.nan)
+        self._launch_late[sources] = late_values
+        self._launch_early = np.full(early.shape, np.nan)
+        self._launch_early[sources] = early_values
+
+        self.ff_ends = ffs
+        self.out_ends = np.flatnonzero(levels.is_port & ~levels.is_in_port)
+        self.endpoints = np.concatenate([self.ff_ends, self.out_ends])
+        outs = self.out_ends
+        nan_out = np.full((len(outs),) + latency.shape[1:], np.nan)
+
+        # DFF end points
+        self._offset = latency + delay
+        self.late_arrival = np.concatenate([
+            np.maximum(late[ffs, ..., 0], late[ffs, ..., 1] + self._offset),
+            late[outs, ..., 0],
+        ])
+        self.early_arrival = np.concatenate([
+            np.minimum(early[ffs, ..., 0], early[ffs, ..., 1] + self._offset),
+            early[outs, ..., 0],
+        ])
+        self.setup_required = np.concatenate([
+            period + latency - tsu,
+            nan_out,
+        ])
+        self.hold_required = np.concatenate([
+            latency + thold,
+            nan_out,
+        ])
+        # Out port end points are checked against their launch DFF
+        self.setup_slack = np.concatenate([
+            self.setup_required[:len(ffs)] - self.late_arrival[:len(ffs)],
+            -tsu - late[outs, ..., 2],
+        ])
+        self.hold_slack = np.concatenate([
+            self.early_arrival[:len(ffs)] - self.hold_required[:len(ffs)],
+            early[outs, ..., 2] - thold,
+        ])
+        # In port to out port delay, -inf if not reached by any in port
+        self.comb_delay = late[outs, ..., 1]
+
+    def names(self):
+        return [self.levels.nodes[i] for i in self.endpoints]
+
+    def wns(self, kind: str = 'setup'):
+        """Worst negative slack, one per corner with corners"""
+        slack = self.setup_slack if kind == 'setup' else self.hold_slack
+        return np.minimum(slack.min(axis=0, initial=np.inf), 0.)
+
+    def tns(self, kind: str = 'setup'):
+        """Total negative slack of the end points, one per corner"""
+        slack = self.setup_slack if kind == 'setup' else self.hold_slack
+        return np.where(slack < 0, slack, 0.).sum(axis=0)
+
+    def worst_path(self, kind: str = 'setup', corner: int = None) -> list:
+        """Trace back the path with the worst setup or hold slack
+
+        corner is the index of the corner to look at when timed with
+        corners. Returns the node list of the path, or None if no path
+        reaches any end point.
+        """
+
+        def at(values):
+            return values[:, corner] if self.corners else values
+
+        setup = kind == 'setup'
+        slack = at(self.setup_slack if setup else self.hold_slack)
+        if not np.isfinite(slack).any():
+            return None
+        arrival = at(self._late if setup else self._early)
+        launch = at(self._launch_late if setup else self._launch_early)
+        node_delay = at(self.node_delay) if self.node_delay.ndim > 1 \
+            else self.node_delay
+        worse = np.greater if setup else np.less
+
+        levels = self.levels
+        graph = self.net_graph.graph
+        j = int(np.argmin(slack))
+        end = self.endpoints[j]
+        # Which kind of start point the worst arrival came from
+        if j < len(self.ff_ends):
+            offset = at(self._offset)[j]
+            column = 1 if worse(arrival[end, 1] + offset,
+                                arrival[end, 0]) else 0
+        else:
+            column = 2
+
+        path = [levels.nodes[end]]
+        while True:
+            best, best_value = None, None
+            for u in graph.predecessors(path[-1]):
+                i = levels.index[u]
+                if levels.is_start[i]:
+                    value = launch[i, column]
+                elif levels.is_cell[i]:
+                    value = arrival[i, column] + node_delay[i]
+                else:
+                    continue
+                edge = graph.edges[u, path[-1]]
+                if self.corners:
+                    value += self.corners[corner].edge_delay(edge)
+                else:
+                    value += edge['delay']
+                if np.isfinite(value) and (best is None
+                                           or worse(value, best_value)):
+                    best, best_value = i, value
+            path.append(levels.nodes[best])
+            if levels.is_start[best]:
+                return path[::-1]
+
+
+_OTHER, _CELL, _DFF, _IN_PORT, _OUT_PORT = range(5)
+
+
+def _node_kind(property) -> int:
+    if isinstance(property, ta.Cell):
+        return _CELL
+    if isinstance(property, ta.DFF):
+        return _DFF
+    if isinstance(property, ta.Port):
+        if property.direction_of_signal == 'in':
+            return _IN_PORT
+        return _OUT_PORT
+    return _OTHER
+
+
+def _broadcast_columns(values: np.ndarray, ndim: int):
+    """Append unit axes so a per node/edge array broadcasts over columns"""
+    values = np.asarray(values, dtype=np.float64)
+    return values.reshape(values.shape + (1,) * (ndim - values.ndim))
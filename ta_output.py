@@ -0,0 +1,294 @@
+import json
+import math
+import os
+from pathlib import Path as FilePath
+import numpy as np
+import ta_classes as ta
+import ta_functions as taf
+
+
+# Path kinds, in the order of the 'kind' column
+PATH_KINDS = ['ff_to_ff', 'in_to_ff', 'ff_to_out', 'in_to_out']
+# End point kinds
+ENDPOINT_KINDS = ['dff', 'out_port']
+
+PATH_COLUMNS = {
+    'start': np.int32,
+    'end': np.int32,
+    'kind': np.uint8,
+    'clock': np.int16,
+    'arrival': np.float64,
+    'setup_required': np.float64,
+    'hold_required': np.float64,
+    'setup_slack': np.float64,
+    'hold_slack': np.float64,
+    # Hops of path i are hops[hop_end[i - 1]:hop_end[i]]
+    'hop_end': np.int64,
+}
+ENDPOINT_COLUMNS = {
+    'node': np.int32,
+    'kind': np.uint8,
+    'clock': np.int16,
+    'late_arrival': np.float64,
+    'early_arrival': np.float64,
+    'setup_required': np.float64,
+    'hold_required': np.float64,
+    'setup_slack': np.float64,
+    'hold_slack': np.float64,
+}
+
+
+class TimingWriter:
+    """Streams path and end point records in a machine readable form
+
+    Everything goes into the directory out_dir:
+        nodes.txt     node name of each node id, one per line
+        meta.json     clock names, kinds, column dtypes and record counts
+    and with fmt 'bin' one raw little-endian file per column,
+        paths.<column>.bin, paths.hops.bin, endpoints.<column>.bin
+    which load_timing() maps straight into NumPy arrays, or with fmt
+    'jsonl' paths.jsonl and endpoints.jsonl with one record per line.
+
+    Nodes are referenced by their id in NetGraph.levelize().nodes and
+    clocks by their position in meta.json. Records are buffered and
+    written out batch_size at a time, so memory stays flat no matter how
+    many paths are added.
+
+    resume is a state() taken earlier: the records written after it are
+    cut off and the writer carries on from there.
+    """
+
+    def __init__(self, net_graph, out_dir, fmt: str = 'bin',
+                 batch_size: int = 65536, resume: dict = None):
+        if fmt not in ('bin', 'jsonl'):
+            raise Exception(f'unknown timing output format {fmt}')
+        self.net_graph = net_graph
+        self.graph = net_graph.graph
+        self.index = net_graph.levelize().index
+        self.out_dir = FilePath(out_dir)
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.clocks = list(net_graph.clk)
+        self._clock_ids = {clk: i for i, clk in enumerate(self.clocks)}
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / 'nodes.txt', 'w') as fout:
+            fout.write('\n'.join(net_graph.levelize().nodes) + '\n')
+        # Start from empty tables, or from the tables as they were at
+        # resume
+        if resume and resume.get('fmt') != fmt:
+            raise Exception(f"can't resume {resume.get('fmt')} timing output "
+                            f'as {fmt}')
+        sizes = resume['sizes'] if resume else {}
+        for table in ('paths', 'endpoints'):
+            for f in self.out_dir.glob(f'{table}.*'):
+                if f.name in sizes:
+                    os.truncate(f, sizes[f.name])
+                else:
+                    f.unlink()
+
+        self.n_paths = resume['n_paths'] if resume else 0
+        self.n_hops = resume['n_hops'] if resume else 0
+        self.n_endpoints = 0
+        self._paths = {column: [] for column in PATH_COLUMNS}
+        self._hops = []
+        self._endpoints = {column: [] for column in ENDPOINT_COLUMNS}
+
+    def add_path(self, path):
+        """Add a FFToFFPath, InToFFPath, FFToOutPath or InToOutPath
+
+        Paths built on a NetGraph.compact() view get their full hop list.
+        """
+        nodes = self.graph.nodes
+        if isinstance(path, ta.InToOutPath):
+            kind = 'in_to_out'
+            clock = -1
+            arrival = path.delay
+            setup_required = hold_required = np.nan
+            setup_slack = hold_slack = np.nan
+        else:
+            if isinstance(path, ta.FFToFFPath):
+                kind = 'ff_to_ff'
+                clk = nodes[path.path[-1]]['property'].clk
+            elif isinstance(path, ta.InToFFPath):
+                kind = 'in_to_ff'
+                clk = nodes[path.path[-1]]['property'].clk
+            else:
+                kind = 'ff_to_out'
+                clk = nodes[path.path[0]]['property'].clk
+            clock = self._clock_ids[clk]
+            arrival = path.data_arrival_time
+            setup_required = path.setup_expected_time
+            hold_required = path.hold_expected_time
+            setup_slack = path.setup_slack
+            hold_slack = path.hold_slack
+
+        hops = [self.index[node]
+                for node in taf.expand_path(path.graph, path.path)]
+        self._hops.extend(hops)
+        self.n_hops += len(hops)
+        for column, value in zip(PATH_COLUMNS, (
+                hops[0], hops[-1], PATH_KINDS.index(kind), clock, arrival,
+                setup_required, hold_required, setup_slack, hold_slack,
+                self.n_hops)):
+            self._paths[column].append(value)
+        self.n_paths += 1
+        if len(self._paths['start']) >= self.batch_size:
+            self._flush_paths()
+
+    def add_endpoints(self, timing):
+        """Add every end point of a ta_levels.EndpointTiming"""
+        levels = timing.levels
+        n_ff = len(timing.ff_ends)
+        clocks = []
+        for i, node in enumerate(timing.endpoints):
+            if i < n_ff:
+                clk = self.graph.nodes[levels.nodes[node]]['property'].clk
+                clocks.append(self._clock_ids[clk])
+            else:
+                clocks.append(-1)
+        columns = {
+            'node': timing.endpoints,
+            'kind': np.repeat([0, 1], [n_ff, len(timing.out_ends)]),
+            'clock': clocks,
+            'late_arrival': timing.late_arrival,
+            'early_arrival': timing.early_arrival,
+            'setup_required': timing.setup_required,
+            'hold_required': timing.hold_required,
+            'setup_slack': timing.setup_slack,
+            'hold_slack': timing.hold_slack,
+        }
+        for column in ENDPOINT_COLUMNS:
+            self._endpoints[column].extend(np.asarray(columns[column]).tolist())
+        self.n_endpoints += len(timing.endpoints)
+        self._flush_endpoints()
+
+    def state(self) -> dict:
+        """Flush the paths added so far and return where the tables end"""
+        self._flush_paths()
+        return {
+            'fmt': self.fmt,
+            'n_paths': self.n_paths,
+            'n_hops': self.n_hops,
+            'sizes': {f.name: f.stat().st_size
+                      for f in self.out_dir.glob('paths.*')},
+        }
+
+    def close(self):
+        """Flush the last batch and write meta.json"""
+        self._flush_paths()
+        self._flush_endpoints()
+        meta = {
+            'format': self.fmt,
+            'clocks': self.clocks,
+            'path_kinds': PATH_KINDS,
+            'endpoint_kinds': ENDPOINT_KINDS,
+            'n_paths': self.n_paths,
+            'n_hops': self.n_hops,
+            'n_endpoints': self.n_endpoints,
+            'path_columns': {c: np.dtype(t).str
+                             for c, t in PATH_COLUMNS.items()},
+            'endpoint_columns': {c: np.dtype(t).str
+                                 for c, t in ENDPOINT_COLUMNS.items()},
+        }
+        with open(self.out_dir / 'meta.json', 'w') as fout:
+            json.dump(meta, fout, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush_paths(self):
+        if not self._paths['start']:
+            return
+        if self.fmt == 'bin':
+            self._append_columns('paths', PATH_COLUMNS, self._paths)
+            with open(self.out_dir / 'paths.hops.bin', 'ab') as fout:
+                np.asarray(self._hops, dtype='<i4').tofile(fout)
+        else:
+            # hop_end counts from the first path ever added, the buffer
+            # only holds the hops of this batch
+            base = self.n_hops - len(self._hops)
+            begin = 0
+            records = []
+            for i in range(len(self._paths['start'])):
+                record = {c: _json_value(self._paths[c][i])
+                          for c in PATH_COLUMNS if c != 'hop_end'}
+                record['kind'] = PATH_KINDS[record['kind']]
+                end = self._paths['hop_end'][i] - base
+                record['hops'] = self._hops[begin:end]
+                begin = end
+                records.append(record)
+            self._append_jsonl('paths', records)
+        self._paths = {column: [] for column in PATH_COLUMNS}
+        self._hops = []
+
+    def _flush_endpoints(self):
+        if not self._endpoints['node']:
+            return
+        if self.fmt == 'bin':
+            self._append_columns('endpoints', ENDPOINT_COLUMNS,
+                                 self._endpoints)
+        else:
+            records = []
+            for i in range(len(self._endpoints['node'])):
+                record = {c: _json_value(self._endpoints[c][i])
+                          for c in ENDPOINT_COLUMNS}
+                record['kind'] = ENDPOINT_KINDS[record['kind']]
+                records.append(record)
+            self._append_jsonl('endpoints', records)
+        self._endpoints = {column: [] for column in ENDPOINT_COLUMNS}
+
+    def _append_columns(self, table: str, dtypes: dict, columns: dict):
+        for column, dtype in dtypes.items():
+            with open(self.out_dir / f'{table}.{column}.bin', 'ab') as fout:
+                np.asarray(columns[column],
+                           dtype=np.dtype(dtype).newbyteorder('<')
+                           ).tofile(fout)
+
+    def _append_jsonl(self, table: str, records: list):
+        with open(self.out_dir / f'{table}.jsonl', 'a') as fout:
+            for record in records:
+                fout.write(json.dumps(record, allow_nan=False) + '\n')
+
+
+def load_timing(out_dir) -> dict:
+    """Load what a 'bin' TimingWriter wrote, without parsing anything
+
+    Returns a dict with 'meta', 'nodes', 'paths', 'hops' and 'endpoints',
+    where 'paths' and 'endpoints' map column names to read-only memory
+    mapped arrays.
+    """
+
+    out_dir = FilePath(out_dir)
+    with open(out_dir / 'meta.json') as f:
+        meta = json.load(f)
+    if meta['format'] != 'bin':
+        raise Exception(f"{out_dir} holds {meta['format']} records, "
+                        "read them line by line instead")
+    with open(out_dir / 'nodes.txt') as f:
+        nodes = f.read().splitlines()
+    timing = {'meta': meta, 'nodes': nodes}
+    for table, count in (('paths', meta['n_paths']),
+                         ('endpoints', meta['n_endpoints'])):
+        timing[table] = {
+            column: _map(out_dir / f'{table}.{column}.bin', dtype, count)
+            for column, dtype in meta[f'{table[:-1]}_columns'].items()
+        }
+    timing['hops'] = _map(out_dir / 'paths.hops.bin', '<i4', meta['n_hops'])
+    return timing
+
+
+def _map(file, dtype, count: int):
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(file, dtype=dtype, mode='r', shape=(count,))
+
+
+def _json_value(value):
+    """NaN and +-inf (unreached) aren't valid JSON, write null instead"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
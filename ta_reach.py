@@ -0,0 +1,171 @@
+import numpy as np
+import ta_functions as taf
+
+
+class ReachabilityIndex:
+    """Which end points each node reaches and which start points reach it
+
+    Every end point (DFF or port) owns one bit of an endpoint bitset and
+    every start point (DFF or in port) one bit of a start point bitset.
+    A bitset is a dict of CHUNK_BITS wide chunks, {chunk number: int},
+    holding only the chunks with a bit set, so a node reaching a few far
+    apart end points stays small. Bitsets are never modified once built:
+    a union that adds nothing returns one of its operands, which makes a
+    node whose fanout all goes through one successor share the very same
+    dict object with it.
+
+    The endpoint sets of every node are built in one reverse topological
+    pass over the levelized edges, the start point sets of the end points
+    in one forward pass the first time they are asked for. After that cone
+    queries are a lookup and a bitwise AND instead of a graph traversal.
+    """
+
+    def __init__(self, net_graph):
+        self.net_graph = net_graph
+        levels = net_graph.levelize()
+        self.levels = levels
+        self.index = levels.index
+        n = len(levels.nodes)
+
+        ends = np.flatnonzero(levels.is_end)
+        starts = np.flatnonzero(levels.is_start)
+        self.endpoints = [levels.nodes[i] for i in ends]
+        self.start_points = [levels.nodes[i] for i in starts]
+        self.end_bit = [_EMPTY] * n
+        for k, i in enumerate(ends.tolist()):
+            self.end_bit[i] = _bit(k)
+        self.start_bit = [_EMPTY] * n
+        for k, i in enumerate(starts.tolist()):
+            self.start_bit[i] = _bit(k)
+
+        # Edges are sorted by the level of their tail, so walking them
+        # backwards only reads the fanout of a cell after all of its own
+        # edges have been merged. End points contribute their own bit and
+        # stop there, like get_paths() does.
+        end_bit = self.end_bit
+        fanout = [_EMPTY] * n
+        for u, v in zip(reversed(levels.edge_tail.tolist()),
+                        reversed(levels.edge_head.tolist())):
+            fanout[u] = _union(fanout[u], end_bit[v] or fanout[v])
+        self.fanout = fanout
+        self._fanin = None
+
+    @property
+    def fanin(self):
+        """Start point bitset of every end point, built on first use
+
+        Cell sets are only needed until the edges leaving their level are
+        merged, so they are dropped right after to bound the memory to the
+        widest level.
+        """
+
+        if self._fanin is None:
+            levels = self.levels
+            start_bit = self.start_bit
+            tail = levels.edge_tail.tolist()
+            head = levels.edge_head.tolist()
+            bounds = levels.level_edges.tolist()
+            cell_bounds = levels.level_cells.tolist()
+            cells = levels.level_cell_nodes.tolist()
+            fanin = [_EMPTY] * len(levels.nodes)
+            for current in range(levels.n_levels):
+                for j in range(bounds[current], bounds[current + 1]):
+                    fanin[head[j]] = _union(
+                        fanin[head[j]], start_bit[tail[j]] or fanin[tail[j]])
+                for u in cells[cell_bounds[current]:cell_bounds[current + 1]]:
+                    fanin[u] = _EMPTY
+            self._fanin = fanin
+        return self._fanin
+
+    def endpoints_of(self, node) -> list:
+        """End points reachable from node"""
+        return _decode(self.fanout[self.index[node]], self.endpoints)
+
+    def start_points_of(self, end) -> list:
+        """Start points that reach end point end"""
+        return _decode(self.fanin[self.index[end]], self.start_points)
+
+    def reaches(self, start, end) -> bool:
+        """Whether any data path leads from start to end point end"""
+        return _intersects(self.fanout[self.index[start]],
+                           self.end_bit[self.index[end]])
+
+    def end_mask(self, ends) -> dict:
+        """Endpoint bitset of the given end points"""
+        mask = {}
+        for end in ends:
+            for chunk, word in self.end_bit[self.index[end]].items():
+                mask[chunk] = mask.get(chunk, 0) | word
+        return mask
+
+    def get_paths(self, start, ends):
+        """Generate the paths from start that stop at one of ends
+
+        Same as taf.get_paths(feedback=True), but a child is only visited
+        if it is one of the selected end points or can still reach one, so
+        no time is spent in the rest of the fanout cone.
+        """
+
+        mask = self.end_mask(ends)
+        if not _intersects(self.fanout[self.index[start]], mask):
+            return
+        index = self.index
+        end_bit = self.end_bit
+        fanout = self.fanout
+
+        def keep(child):
+            i = index[child]
+            return _intersects(end_bit[i] or fanout[i], mask)
+
+        yield from taf.get_paths(self.net_graph.graph, start, keep,
+                                 feedback=True)
+
+
+# Bits per chunk of a bitset
+CHUNK_BITS = 1024
+# The empty bitset, shared and never modified
+_EMPTY = {}
+
+
+def _bit(k: int) -> dict:
+    """Bitset holding bit k only"""
+    return {k // CHUNK_BITS: 1 << (k % CHUNK_BITS)}
+
+
+def _union(a: dict, b: dict) -> dict:
+    """Union of two bitsets, one of them itself if it holds the other"""
+    if a is b or not b:
+        return a
+    if not a:
+        return b
+    if len(a) < len(b):
+        a, b = b, a
+    union = None
+    for chunk, word in b.items():
+        old = a.get(chunk, 0)
+        if old | word != old:
+            if union is None:
+                union = dict(a)
+            union[chunk] = old | word
+    if union is None:
+        return a
+    return union
+
+
+def _intersects(a: dict, b: dict) -> bool:
+    if len(a) > len(b):
+        a, b = b, a
+    return any(word & b.get(chunk, 0) for chunk, word in a.items())
+
+
+def _decode(bits: dict, names: list) -> list:
+    """Names of the set bits of a bitset"""
+    positions = []
+    for chunk in sorted(bits):
+        word = bits[chunk]
+        raw = np.frombuffer(word.to_bytes(CHUNK_BITS // 8, 'little'),
+                            np.uint8)
+        positions.extend(chunk * CHUNK_BITS
+                         + np.flatnonzero(np.unpackbits(raw,
+                                                        bitorder='little')))
+    return [names[k] for k in positions]
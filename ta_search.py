@@ -0,0 +1,177 @@
+import heapq
+import numpy as np
+
+
+class ViolationSearch:
+    """Branch and bound path enumeration that only visits violating paths
+
+    Before the search, one backward propagation over the levelized graph
+    gives every node the latest and earliest time left until any end point
+    it reaches, already offset by the end point's setup and hold required
+    time. During the DFS the arrival time at a node plus that bound is the
+    worst setup (hold) slack any path through it can still have, so a
+    branch is cut as soon as neither bound can go below the threshold.
+
+    The threshold is 0, so every violating path is still enumerated and
+    the total slack stays exact. With top_k, it tightens to the k-th worst
+    slack found so far, which only keeps the k worst paths of each check.
+    With keep_comb, in port branches that reach an out port are kept as
+    well, for the combinational path report.
+    """
+
+    # Bounds are summed in a different order than the Path classes do,
+    # don't cut a branch that's only this close to the threshold
+    eps = 1e-9
+
+    def __init__(self, net_graph, top_k: int = None, keep_comb: bool = False):
+        self.net_graph = net_graph
+        self.graph = net_graph.graph
+        self.top_k = top_k
+        self.keep_comb = keep_comb
+        levels = net_graph.levelize()
+        self.levels = levels
+        self.index = levels.index
+
+        late, early = remaining_bounds(net_graph)
+        self._late = [late[:, k].tolist() for k in range(3)]
+        self._early = [early[:, k].tolist() for k in range(3)]
+
+        self._is_end = levels.is_end.tolist()
+        self._node_delay = levels.node_delay.tolist()
+        # Negated k worst setup and hold slacks so far, the root of each
+        # heap is the k-th worst one
+        self._setup_heap = []
+        self._hold_heap = []
+
+    def setup_threshold(self) -> float:
+        if self.top_k and len(self._setup_heap) >= self.top_k:
+            return min(0., -self._setup_heap[0])
+        return 0.
+
+    def hold_threshold(self) -> float:
+        if self.top_k and len(self._hold_heap) >= self.top_k:
+            return min(0., -self._hold_heap[0])
+        return 0.
+
+    def get_paths(self, start):
+        """Generate the paths from start that may violate setup or hold
+
+        Like taf.get_paths(feedback=True), the yielded list is reused, copy it to keep
+        it. Callers still check is_setup_violated / is_hold_violated, a
+        few paths right at the threshold may come through.
+        """
+
+        graph = self.graph
+        index = self.index
+        is_end = self._is_end
+        node_delay = self._node_delay
+        eps = self.eps
+        top_k = self.top_k
+        start_property = graph.nodes[start]['property']
+        i = index[start]
+
+        if self.levels.is_in_port[i]:
+            arrival = 0.
+            late, early = self._late[2], self._early[2]
+            setup_late = None
+            comb = self._late[1] if self.keep_comb else None
+        else:
+            arrival = (start_property.clock_source_latency
+                       + start_property.delay)
+            late, early = self._late[0], self._early[0]
+            setup_late, hold_early = self._late[1], self._early[1]
+            out_setup_required = (self.net_graph.clk[start_property.clk]
+                                  + start_property.clock_source_latency
+                                  - self.net_graph.tsu)
+            out_hold_required = (start_property.clock_source_latency
+                                 + self.net_graph.thold)
+            comb = None
+
+        # A DFF's feedback path back onto itself is searched too, the
+        # bounds include it
+        loop_back = bool(self.levels.is_dff[i])
+        path_nodes = [start]
+
+        def search(parent, parent_arrival):
+            for child, edge in graph[parent].items():
+                if child in path_nodes and not (loop_back and child == start):
+                    continue
+                i = index[child]
+                child_arrival = parent_arrival + edge['delay']
+                worst_setup = -(child_arrival + late[i])
+                worst_hold = child_arrival + early[i]
+                if setup_late is not None:
+                    worst_setup = min(worst_setup, out_setup_required
+                                      - (child_arrival + setup_late[i]))
+                    worst_hold = min(worst_hold, child_arrival + hold_early[i]
+                                     - out_hold_required)
+                if (worst_setup >= self.setup_threshold() + eps
+                        and worst_hold >= self.hold_threshold() + eps
+                        and not (comb and comb[i] > -np.inf)):
+                    continue
+
+                path_nodes.append(child)
+                if is_end[i]:
+                    if top_k:
+                        # At an end point the bound is the exact slack
+                        _push(self._setup_heap, worst_setup, top_k)
+                        _push(self._hold_heap, worst_hold, top_k)
+                    yield path_nodes
+                else:
+                    yield from search(child, child_arrival + node_delay[i])
+                path_nodes.pop(-1)
+
+        yield from search(start, arrival)
+
+
+def remaining_bounds(net_graph):
+    """Latest and earliest time left from every node input to its end points
+
+    Both are (n, 3) arrays, already offset by the required times:
+
+    Column 0: DFF start to DFF end, setup slack is -(arrival + late)
+              and hold slack arrival + early
+    Column 1: DFF start to out port, plain remaining delay since the
+              required time comes from the launch DFF
+    Column 2: in port start to DFF end, arrival relative to the virtual
+              DFF which adds the catch DFF latency and delay
+    """
+
+    levels = net_graph.levelize()
+    nodes = net_graph.graph.nodes
+    ffs = np.flatnonzero(levels.is_dff)
+    outs = np.flatnonzero(levels.is_port & ~levels.is_in_port)
+    dffs = [nodes[levels.nodes[i]]['property'] for i in ffs]
+    latency = np.array([ff.clock_source_latency for ff in dffs])
+    period = np.array([net_graph.clk[ff.clk] for ff in dffs])
+    delay = levels.node_delay[ffs]
+    setup_required = period + latency - net_graph.tsu
+    hold_required = latency + net_graph.thold
+
+    sinks = np.concatenate([ffs, outs])
+    nan_ff = np.full(len(ffs), np.nan)
+    nan_out = np.full(len(outs), np.nan)
+    in_offset = latency + delay
+    late, early = levels.propagate_backward(
+        sinks,
+        np.column_stack([
+            np.concatenate([-setup_required, nan_out]),
+            np.concatenate([nan_ff, np.zeros(len(outs))]),
+            np.concatenate([in_offset - setup_required, nan_out]),
+        ]),
+        np.column_stack([
+            np.concatenate([-hold_required, nan_out]),
+            np.concatenate([nan_ff, np.zeros(len(outs))]),
+            np.concatenate([in_offset - hold_required, nan_out]),
+        ]))
+    return late, early
+
+
+def _push(heap: list, slack: float, k: int):
+    """Keep the k worst violating slacks, negated, in a heap"""
+    if slack >= 0:
+        return
+    if len(heap) < k:
+        heapq.heappush(heap, -slack)
+    elif slack < -heap[0]:
+        heapq.heapreplace(heap, -slack)